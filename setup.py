@@ -45,7 +45,7 @@ setup(name = 'permm',
       package_dir = {'': 'src'},
       package_data = {'permm': data},
       scripts = ['scripts/permm'],
-      requires = ['numpy (>=1.2)', 'yaml', 'netCDF4'],
+      requires = ['numpy (>=1.17)', 'yaml', 'netCDF4'],
       url = 'http://github.com/barronh/permm/',
       download_url = 'https://github.com/barronh/permm/archive/v1.0.zip'
       )
@@ -132,7 +132,7 @@ class Process(object):
             for key in list(self.keys()):
                 try:
                     result[key] = operator(self[key], rhs)
-                except:
+                except Exception:
                     raise TypeError("It is unclear how to %s IPR and %s; scalars, arrays, species and processes should have meaningful results" % (operation, type(rhs)))
             
         return result
@@ -1,26 +1,47 @@
 from __future__ import print_function
-import operator
 import yaml
 import re
 import sys
-from numpy import * # Explicitly using dtype, array and ndarray; providing all default numpy to __call__interface
+import numpy
+from numpy import dtype, \
+                  array, \
+                  ndarray, \
+                  zeros, \
+                  float64, \
+                  concatenate, \
+                  moveaxis, \
+                  diff, \
+                  result_type, \
+                  bitwise_and, \
+                  bitwise_or, \
+                  packbits, \
+                  unpackbits
 from warnings import warn
 
 from PseudoNetCDF.sci_var import PseudoNetCDFVariable
 
 from .Species import Species, species_sum
-from .Reaction import Reaction
+from .Reaction import Reaction, reaction_sum
 from .IPRArray import Processes_ProcDelimSpcDict, Process
 
 from permm.graphing.timeseries import irr_plot, phy_plot, plot as tplot
 from permm.Shell import load_environ
 from permm.netcdf import NetCDFVariable
-from functools import reduce
+from functools import reduce, lru_cache
+from itertools import chain
+from collections import defaultdict
+from numpy.lib.recfunctions import structured_to_unstructured
+
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
 
 __all__ = ['Mechanism']
 
 _spc_def_re = re.compile(r'(?P<stoic>[-+]?[0-9]*\.?[0-9]+)(?P<atom>\S+)(?=\s*\+\s*)?')
 _numre = re.compile('(\d+)')
+_sumre = re.compile(r'^\s*\w+(\s*\+\s*\w+)*\s*$')
 
 class Mechanism(object):
     """
@@ -51,6 +72,7 @@ class Mechanism(object):
         eqnmech = cls.from_eqns(eqnm[0][:-1], verbose=verbose)
         varmech.species_dict.update(fixmech.species_dict)
         varmech.reaction_dict.update(eqnmech.reaction_dict)
+        varmech.__reactions_changed()
         return varmech
 
     @classmethod
@@ -65,10 +87,9 @@ class Mechanism(object):
         spctxt = re.compile(r'[ \t]+').sub(' ', spctxt)
         spctxt = re.compile(r'[ \t]*(.+?)[ \t]*=[ \t]*(.+)[ \t]*;[ \t]*(?:{.+?})?[ \t]*').sub(r"    '\1': '\2'", spctxt)
         spctxt = 'species_list:\n' + spctxt
-        from io import StringIO
         if verbose > 0:
             print(spctxt)
-        spcdict = yaml.safe_load(StringIO(spctxt))
+        spcdict = yaml.load(spctxt, Loader = _SafeLoader)
         return cls(spcdict)
 
     @classmethod
@@ -92,10 +113,9 @@ class Mechanism(object):
         rxntxt = re.compile(r'^\s*[<{](.+?)\.?[>}]', re.MULTILINE).sub(r'    IRR_\1: ', rxntxt)
         rxntxt = re.compile(r'{(.+?)}').sub(r'\1', rxntxt)
         rxntxt = 'reaction_list:\n' + rxntxt
-        from io import StringIO
         if verbose > 0:
             print(rxntxt)
-        rxndict = yaml.safe_load(StringIO(rxntxt))
+        rxndict = yaml.load(rxntxt, Loader = _SafeLoader)
         return cls(rxndict)
         
     def __init__(self, yaml_path):
@@ -115,28 +135,26 @@ class Mechanism(object):
         import os
         if isinstance(yaml_path,str):
             if os.path.exists(yaml_path):
-                yaml_file = yaml.safe_load(open(yaml_path))
+                with open(yaml_path, 'rb') as yaml_stream:
+                    yaml_file = yaml.load(yaml_stream, Loader = _SafeLoader)
             else:
-                yaml_file = yaml.safe_load(yaml_path)
+                yaml_file = yaml.load(yaml_path, Loader = _SafeLoader)
         elif isinstance(yaml_path,dict):
             yaml_file = yaml_path
         
         self.__yaml_file = yaml_file
         self.mechanism_comment = yaml_file.get('comment', '')
-        self.species_dict = dict()
-
-        for spc, spc_def in yaml_file.get('species_list', {}).items():
-            self.species_dict[spc] = Species("'" + spc + "': " + spc_def)
+        self.species_dict = dict([(spc, Species("'" + spc + "': " + spc_def)) for spc, spc_def in yaml_file.get('species_list', {}).items()])
                         
         self.reaction_dict = dict()
-        reaction_species = []
+        reaction_species = set()
         for rxn_name, rxn_str in yaml_file.get('reaction_list', {}).items():
             rxn = self.reaction_dict[rxn_name] = Reaction(rxn_str)
-            reaction_species += rxn.species()
+            reaction_species.update(rxn.species())
+        self.__reactions_changed()
         
-        reaction_species = set(reaction_species)
-        for spc in [spc for spc in reaction_species if spc not in self.species_dict]:
-            self.species_dict[spc] = Species(spc + ': IGNORE')
+        missing = reaction_species.difference(self.species_dict)
+        self.species_dict.update([(spc, Species(spc + ': IGNORE')) for spc in missing])
 
         for spc_grp_def in yaml_file.get('species_group_list',[]):
             grp_name = spc_grp_def.split('=')[0].strip()
@@ -147,6 +165,7 @@ class Mechanism(object):
 
         self.net_reaction_dict = yaml_file.get('net_reaction_list',{})
         self.variables = {}
+        self._resolved_species = {}
         load_environ(self, self.variables)
             
     def __call__(self, expr, env = None):
@@ -155,14 +174,17 @@ class Mechanism(object):
         species, species groups, reactions, net reactions and processes
         
         expr - string to evaluate
-        env - optional, global environment that defaults to globals()
+        env - optional, global environment that defaults to this module's
+              globals plus the numpy namespace
         """
         if env is None:
-            env = globals()
+            env = _call_env()
 
         try:
             return self.variables[expr]
-        except:
+        except (KeyError, TypeError):
+            if isinstance(expr, str):
+                expr = _compile_expr(expr)
             return eval(expr, env, self.variables)
     
     def __getitem__(self,item):
@@ -189,6 +211,7 @@ class Mechanism(object):
             
         for rxn in rxn_list:
             self.reaction_dict[rxn] = self.reaction_dict[rxn] + spc
+        self.__reactions_changed()
         
         return len(rxn_list)
     
@@ -200,6 +223,24 @@ class Mechanism(object):
             spc = self.species_dict[spc]
         return spc
         
+    def __resolve_species(self, spcs):
+        """
+        Return a list of (species, _species_key) pairs for spcs (a species,
+        a name, or a list of either); keys are reused for as long as a
+        name refers to the same Species object
+        """
+        if isinstance(spcs, (Species, str)):
+            spcs = [spcs]
+
+        result = []
+        for spc in spcs:
+            spc = self.__ensure_species(spc)
+            resolved = self._resolved_species.get(spc.name)
+            if resolved is None or resolved[0] is not spc:
+                resolved = self._resolved_species[spc.name] = (spc, _species_key(spc))
+            result.append(resolved)
+        return result
+
     def add_rct_to_reactions(self, spc):
         """
         Add spc to reactions where components are reactants
@@ -225,9 +266,12 @@ class Mechanism(object):
         Add spc to reactions where components are reactants
         or products see __ensure_species
         """
-        nrcts = self.add_rct_to_reactions(spc)
-        nprds = self.add_prd_to_reactions(spc)
-        return nrcts+nprds
+        spc = self.__ensure_species(spc)
+
+        rct_rxns = self.find_rxns(reactants = spc)
+        prd_rxns = self.find_rxns(reactants = [], products = spc)
+        self.__add_spc_to_reactions(sorted(set(rct_rxns).union(prd_rxns)), spc)
+        return len(rct_rxns) + len(prd_rxns)
 
     def add_spc_to_reactions_with_condition(self, spc, condition):
         """
@@ -236,13 +280,10 @@ class Mechanism(object):
         """
         spc = self.__ensure_species(spc)
         
-        new_rxn_def = {}
-        for rxn_name, rxn in self.reaction_dict.items():
-            if condition(rxn):
-                rxn = rxn + spc
-                new_rxn_def[rxn_name] = rxn
+        new_rxn_def = dict([(rxn_name, rxn + spc) for rxn_name, rxn in self.reaction_dict.items() if condition(rxn)])
         
         self.reaction_dict.update(new_rxn_def)
+        self.__reactions_changed()
 
         return len(new_rxn_def)
     
@@ -310,57 +351,105 @@ class Mechanism(object):
                       True: reaction is in both filters (i.e. reactants AND products)
                       False: reaction is in either filter (i.e. reactants OR products)
         """
-        if isinstance(reactants, (Species, str)):
-            reactants = [reactants]
-        
-        reactants = [self.__ensure_species(spc) for spc in reactants]
-            
-        if isinstance(products, (Species, str)):
-            products = [products]
+        reactants = self.__resolve_species(reactants)
+        products = self.__resolve_species(products)
 
-        products = [self.__ensure_species(spc) for spc in products]
-            
-        result = [(rxn_name, rxn) for rxn_name, rxn in self.reaction_dict.items()]
-        
-        if reactants != []:
-            reactant_result = [rxn_name for rxn_name, rxn in result if all([rxn.has_rct(rct) for rct in reactants])]
-        else:
-            reactant_result = [rn for rn, rv in result]
-        
-        if products != []:
-            product_result = [rxn_name for rxn_name, rxn in result if all([rxn.has_prd(prd) for prd in products])]
+        # reaction_type may be any container (e.g., 'kj' or ['k', 'j'])
+        if reaction_type is None or isinstance(reaction_type, str):
+            type_key = reaction_type
         else:
-            product_result = [rn for rn, rv in result]
-                
-            
+            type_key = frozenset(reaction_type)
+        cache_key = (tuple(sorted(key for spc, key in reactants)),
+                     tuple(sorted(key for spc, key in products)),
+                     bool(logical_and), type_key)
+        if cache_key in self._find_rxns_cache:
+            return list(self._find_rxns_cache[cache_key])
+
+        reactants = [spc for spc, key in reactants]
+        products = [spc for spc, key in products]
+        reactant_bits = [self.__rxns_with_role(spc, 'r') for spc in reactants]
+        product_bits = [self.__rxns_with_role(spc, 'p') for spc in products]
+
+        # An empty filter matches every reaction
         if logical_and:
-            reaction_list = set(reactant_result).intersection(product_result)
+            reaction_bits = reduce(bitwise_and, reactant_bits + product_bits, self._all_rxn_bits)
+        elif reactant_bits == [] or product_bits == []:
+            reaction_bits = self._all_rxn_bits
         else:
-            reaction_list = set(reactant_result + product_result)
+            reaction_bits = reduce(bitwise_and, reactant_bits) | reduce(bitwise_and, product_bits)
 
+        # Rows are in sorted reaction name order, so the result is sorted
+        rows = unpackbits(reaction_bits.view('u1'), bitorder = 'little').nonzero()[0]
+        result = [self._rxn_names[row] for row in rows]
         if reaction_type is not None:
-            reaction_result = [rn for rn, rv in result if rv.reaction_type in reaction_type]
-            reaction_list = reaction_list.intersection(reaction_result)
+            result = [rn for rn in result if self.reaction_dict[rn].reaction_type in reaction_type]
 
+        self._find_rxns_cache[cache_key] = tuple(result)
         
-        result = list(reaction_list)
-        result.sort()
-        
         return result
+
+    def __rxns_with_role(self, spc, role):
+        """
+        Return a bitset (uint64 words; bit i is reaction _rxn_names[i]) of
+        reactions where spc has role ('r'=reactant or 'p'=product);
+        equivalent to Reaction.has_rct/has_prd
+        """
+        for name in spc.names():
+            if not spc.contains_species_role(name, role):
+                raise TypeError('Requesting %s role from species %s with %s that has roles %s' % (dict(r = 'reactant', p = 'product')[role], spc.name, name, str(list(spc.spc_dict[name]['role']))))
+
+        result = reduce(bitwise_or, [self.__role_bits(name, role) for name in spc.names()])
+        if spc.exclude:
+            result = ~result & self._all_rxn_bits
+        return result
+
+    def __role_bits(self, name, role):
+        """
+        Return the bitset of reactions where species name has role; built
+        from _rct_index/_prd_index on first use
+        """
+        bits = self._rxn_bits.get((name, role))
+        if bits is None:
+            index = dict(r = self._rct_index, p = self._prd_index)[role]
+            rows = [self._rxn_rows[rxn_name] for rxn_name in index.get(name, ())]
+            bits = self._rxn_bits[name, role] = self.__to_bits(rows)
+        return bits
+
+    def __to_bits(self, rows):
+        """
+        Return a bitset with the bits for rows set
+        """
+        mask = zeros(self._rxn_words * 64, dtype = 'bool')
+        mask[rows] = True
+        return packbits(mask, bitorder = 'little').view('<u8')
+
+    def __reactions_changed(self):
+        """
+        Rebuild reaction lookup tables; must be called whenever
+        reaction_dict is modified
+        """
+        self._find_rxns_cache = {}
+        self._stoich = None
+        self._irr_row_index = {}
+        self._rxn_names = sorted(self.reaction_dict)
+        self._rxn_rows = dict([(rxn_name, row) for row, rxn_name in enumerate(self._rxn_names)])
+        self._rxn_bits = {}
+        self._rxn_words = (len(self._rxn_names) + 63) // 64
+        self._all_rxn_bits = self.__to_bits(slice(0, len(self._rxn_names)))
+        rct_index = self._rct_index = defaultdict(set)
+        prd_index = self._prd_index = defaultdict(set)
+        for rxn_name, rxn in self.reaction_dict.items():
+            for spc in rxn.reactants():
+                rct_index[spc].add(rxn_name)
+            for spc in rxn.products():
+                prd_index[spc].add(rxn_name)
     
     def yaml_net_rxn(self, rxns):
         """
         Create the YAML representation of a net reaction for the supplied
-        reactions
+        reactions (not implemented)
         """
-        species = list(set(reduce(operator.add, [self.reaction_dict[rxn].species() for rxn in rxns])))
-        
-        for role in ('r','p'):
-            for spc in species:
-                for rxn in rxns:
-                    method = dict( r = 'has_rct', p = 'has_prd')
-                    if getattr(self.reaction_dict[rxn], method)(spc):
-                        pass
+        raise NotImplementedError('yaml_net_rxn is not implemented; use make_net_rxn or subst_net_rxn')
     
     def subst_net_rxn(self, reactants = [], products = [], logical_and = True, reaction_type = None, name = None, netspc = False):
         """
@@ -388,6 +477,7 @@ class Mechanism(object):
                 del self.variables[rxn]
             self.irr_dict[name] = nrxn
             self.reaction_dict[name] = nrxn.sum()
+            self.__reactions_changed()
             load_environ(self, self.variables)
 
     def subst_these_rxns(self, rxns, name = None):
@@ -432,6 +522,7 @@ class Mechanism(object):
                 del self.variables[rxn]
             self.irr_dict[name] = nrxn
             self.reaction_dict[name] = nrxn.sum()
+            self.__reactions_changed()
             load_environ(self, self.variables)
         
         
@@ -489,7 +580,7 @@ class Mechanism(object):
                 sortby = ([p for p in _ensure_list(products) if not p.exclude]+[r for r in _ensure_list(reactants)  if not r.exclude])[0]
             rxns = [(rxno[sortby], rxn, rxno) for rxn, rxno in rxns]
             rxns.sort(reverse = reverse)
-        except:
+        except Exception:
             rxns = [(_rxn_ordinal(rxn), rxn, rxno) for rxn, rxno in rxns]
             rxns.sort()
             warn("Not all reactions contain %s; check query and/or explicitly define sortby species" % str(sortby))
@@ -575,32 +666,68 @@ class Mechanism(object):
             raise ValueError("Your query didn't match any reactions; check your query and try again (try print_rxns).")
 
         reactions1 = reactions
-        reactions = [ rxn for rxn in reactions if rxn not in reduce(operator.add, combine) ]
+        combined = set(chain.from_iterable(combine))
+        reactions = [ rxn for rxn in reactions if rxn not in combined ]
         nlines = min(nlines, len(reactions)+1)
         if combine != [()] and reactions != reactions1:
             reactions = reactions + ['+'.join(t2) for t2 in combine]
         aslice = kwds.get('slice', slice(None))
-        reactions = [ (abs(self('(%s)' % (rxn))[aslice].get_spc(plot_spc, float64(0.))).sum(),rxn) for rxn in reactions]
+        reactions = list(zip(self.__rxn_throughput(reactions, plot_spc, aslice), reactions))
     
         reactions.sort(reverse = True)
 
         reactions = [r for v,r in reactions]
         if len(reactions) > nlines:
-            for rxn in reactions[nlines-1:]:
-                try:
-                    other = other + self('(%s)' % (rxn,))
-                except:
-                    other = self('(%s)' % (rxn,))
+            other = reaction_sum([self(rxn) for rxn in reactions[nlines-1:]])
         
-            reactions = [self('(%s)' % (rxn, )) for rxn in reactions[:nlines-1]] + [other]
+            reactions = [self(rxn) for rxn in reactions[:nlines-1]] + [other]
         reactions = [(rxn.sum()[plot_spc], rxn) for rxn in reactions]
     
-        reactions.sort(reverse = False)
+        reactions.sort(key = lambda t: t[0], reverse = False)
 
         reactions = [r for v,r in reactions]
         
         return self.plot_rxn_list(reactions = reactions, plot_spc = plot_spc, **kwds)
         
+    def __rxn_throughput(self, reactions, spc, aslice = slice(None)):
+        """
+        Return the absolute change of spc from each reaction summed over
+        aslice of the IRR.  Reactions taken directly from the IRR array
+        where spc matches a single stoichiometry are computed together
+        from their IRR rows (the same float operations as the evaluated
+        reaction); others are evaluated.
+        """
+        spc = self.__ensure_species(spc)
+        fast_rxns = []
+        coefs = []
+        weights = []
+        for rxn in reactions:
+            if rxn not in self._irr_row_index:
+                continue
+            # Several matches are summed before abs() when evaluated,
+            # where float rounding decides the ranking of near-zero
+            # (e.g., both sides of a reaction) changes
+            term = self.reaction_dict[rxn].spc_term(spc)
+            if term is not None:
+                coef, weight = term
+                fast_rxns.append(rxn)
+                coefs.append(float(coef))
+                weights.append(weight)
+
+        result = {}
+        if fast_rxns != []:
+            rows = array([self._irr_row_index[rxn] for rxn in fast_rxns])
+            index = (slice(None),) + (aslice if isinstance(aslice, tuple) else (aslice,))
+            irr_rows = self._irr_rows[rows][index]
+            out_type = result_type(float64(1.), irr_rows)
+            shape = (len(rows),) + (1,) * (irr_rows.ndim - 1)
+            values = irr_rows.astype(out_type) * array(coefs).astype(out_type).reshape(shape)
+            values *= array(weights).astype(out_type).reshape(shape)
+            irr_sums = [abs(value).sum() for value in values]
+            result.update(zip(fast_rxns, irr_sums))
+
+        return [result[rxn] if rxn in result else abs(self(rxn)[aslice].get_spc(spc, float64(0.))).sum() for rxn in reactions]
+
     def print_irrs(self, reactants = [], products = [], logical_and = True, reaction_type = None, factor = 1., sortby = None, reverse = False, slice = slice(None), nspc = 100000, digits = -1, formatter = 'g'):
         """
         For each reaction in find_rxns(reactants, procucts, logical_and),
@@ -619,7 +746,7 @@ class Mechanism(object):
                 sortby = ([p for p in _ensure_list(products) if not p.exclude]+[r for r in _ensure_list(reactants)  if not r.exclude])[0]
             irrs = [(irr[sortby], rxn, irr) for rxn, irr in irrs]
             irrs.sort(reverse = reverse)
-        except:
+        except Exception:
             irrs = [(_rxn_ordinal(rxn), rxn, irr) for rxn, irr in irrs]
             irrs.sort()
             warn("Not all reactions contain %s; check query and/or explicitly define sortby species" % str(sortby))
@@ -638,12 +765,12 @@ class Mechanism(object):
         if use_irr:
             try:
                 self.set_irr(mrg.variables['IRR'], mrg.Reactions.split(), use_net_rxns = use_net_rxns)
-            except:
+            except Exception:
                 self.set_irr()
         if use_ipr:
             try:
                 self.set_ipr(mrg.variables['IPR'])
-            except:
+            except Exception:
                 self.set_ipr()
                         
         
@@ -664,15 +791,11 @@ class Mechanism(object):
 
     def apply_irr(self):
         self.irr_dict = {}
-        for rxn_name, rxn in self.reaction_dict.items():
-            if hasattr(self, 'irr'):
-                try:
-                    self.irr_dict[rxn_name] = rxn * self.irr[rxn_name].view(ndarray)
-                except ValueError as xxx_todo_changeme:
-                    (e) = xxx_todo_changeme
-                    self.irr_dict[rxn_name] = rxn * zeros(self.irr.shape, 'f')
-                    warn("IRR does not contain %s: skipped." % rxn_name)
-            else:
+        self._irr_row_index = {}
+        if hasattr(self, 'irr'):
+            self.__apply_irr_array()
+        else:
+            for rxn_name, rxn in self.reaction_dict.items():
                 try:
                     self.irr_dict[rxn_name] = rxn * self.mrg.variables[rxn_name][:].view(type = PseudoNetCDFVariable).view(ndarray)
                 except (KeyError, ValueError) as xxx_todo_changeme1:
@@ -683,13 +806,70 @@ class Mechanism(object):
             self.nreaction_dict = {}
             for nrxn_name, nrxn in self.net_reaction_dict.items():
                 try:
-                    self.nreaction_dict[nrxn_name] = eval(nrxn, None, self.irr_dict)
+                    # Plain sums of reactions are accumulated in one pass
+                    # rather than through a new Reaction per addition
+                    rxn_names = isinstance(nrxn, str) and _sumre.match(nrxn) and [rxn_name.strip() for rxn_name in nrxn.split('+')]
+                    if rxn_names and len(rxn_names) > 1 and all([rxn_name in self.irr_dict for rxn_name in rxn_names]):
+                        self.nreaction_dict[nrxn_name] = reaction_sum([self.irr_dict[rxn_name] for rxn_name in rxn_names])
+                    else:
+                        self.nreaction_dict[nrxn_name] = eval(nrxn, None, self.irr_dict)
                 except Exception as xxx_todo_changeme2:
                     (e) = xxx_todo_changeme2
                     warn("Predefined net rxn %s is not available; %s" % (nrxn_name, str(e)))
 
         load_environ(self, self.variables)
     
+    def __apply_irr_array(self):
+        """
+        Fill irr_dict from the structured irr array with a single multiply
+        of every reaction stoichiometry by its IRR column
+        """
+        rxn_names, offsets, keys, coefs = self.__stoich_table()
+        irr_names = self.irr.dtype.names
+        irr_shape = self.irr.shape
+        irr_index = dict([(name, i) for i, name in enumerate(irr_names)])
+        for rxn_name in rxn_names:
+            if rxn_name not in irr_index:
+                warn("IRR does not contain %s: skipped." % rxn_name)
+
+        # One row per IRR field plus a final row of zeros for reactions
+        # missing from the IRR
+        irr_rows = moveaxis(structured_to_unstructured(self.irr.view(ndarray)), -1, 0)
+        irr_rows = concatenate([irr_rows, zeros((1,) + irr_shape, 'f')], axis = 0)
+        rxn_rows = array([irr_index.get(rxn_name, len(irr_names)) for rxn_name in rxn_names], dtype = 'i')
+        # A single IRR row has the shape of one field, so a squeezed 0-d
+        # IRR promotes to float64 as multiplying each field did
+        out_type = result_type(float64(1.), irr_rows[0])
+        values = irr_rows[rxn_rows.repeat(diff(offsets))].astype(out_type)
+        values *= coefs.astype(out_type).reshape((-1,) + (1,) * len(irr_shape))
+
+        for ri, rxn_name in enumerate(rxn_names):
+            start, stop = offsets[ri], offsets[ri + 1]
+            rxn_values = dict(zip(keys[start:stop], values[start:stop]))
+            self.irr_dict[rxn_name] = Reaction(rxn_values, reaction_type = self.reaction_dict[rxn_name].reaction_type)
+
+        self._irr_rows = irr_rows
+        self._irr_row_index = dict(zip(rxn_names, rxn_rows))
+
+    def __stoich_table(self):
+        """
+        Return the stoichiometry of all reactions flattened into
+        (rxn_names, offsets, keys, coefs); the (species, role) keys and
+        coefficients of rxn_names[i] are at offsets[i]:offsets[i + 1]
+        """
+        if self._stoich is None:
+            rxn_names = []
+            offsets = [0]
+            keys = []
+            coefs = []
+            for rxn_name, rxn in self.reaction_dict.items():
+                rxn_names.append(rxn_name)
+                keys.extend(rxn._stoic.keys())
+                coefs.extend([float(value) for value in rxn._stoic.values()])
+                offsets.append(len(keys))
+            self._stoich = (rxn_names, array(offsets, dtype = 'i'), keys, array(coefs, dtype = 'd'))
+        return self._stoich
+
     def set_process(self, prc_name, variables):
         if not hasattr(self, 'process_dict'):
             self.process_dict = {}
@@ -726,11 +906,9 @@ class Mechanism(object):
 
             
         # Add extra species for names in IPR
-        spcs = set(reduce(list.__add__, [[spc for spc in list(proc.keys())] for proc in list(self.process_dict.values())]))
-        new_spcs = spcs.difference(list(self.species_dict.keys()))
-        for name in new_spcs:
-            if name not in self.species_dict:
-                self.species_dict[name] = Species(name + ': IGNORE')
+        spcs = set().union(*[proc.keys() for proc in self.process_dict.values()])
+        new_spcs = spcs.difference(self.species_dict)
+        self.species_dict.update([(name, Species(name + ': IGNORE')) for name in new_spcs])
 
     def add_rxn(self, rxn_key, rxn_str):
         """
@@ -742,6 +920,7 @@ class Mechanism(object):
             rxn_str - string that defines the reaction (e.g., N2O + 2 H2O ->[k] HNO3
         """
         self.reaction_dict[rxn_key] = Reaction(rxn_str)
+        self.__reactions_changed()
         if hasattr(self, 'irr_dict'):
             self.irr_dict[rxn_key] = Reaction(rxn_str)
             self.irr_dict[rxn_key] *= self.irr[rxn_key]
@@ -785,20 +964,132 @@ class Mechanism(object):
     def globalize(self, env):
         load_environ(self, env)
 
+@lru_cache(maxsize = 1024)
+def _compile_expr(expr):
+    """
+    Compile a Mechanism.__call__ expression; the most recently used
+    expressions are kept so that repeated queries skip the compiler
+    """
+    return compile(expr, '<mech>', 'eval')
+
+_call_env_cache = {}
+
+def _call_env():
+    """
+    Default global environment for Mechanism.__call__: all public numpy
+    names, as with "from numpy import *", plus this module's globals
+    """
+    if _call_env_cache == {}:
+        _call_env_cache.update([(name, getattr(numpy, name)) for name in numpy.__all__ if hasattr(numpy, name)])
+        _call_env_cache.update(globals())
+    return _call_env_cache
+
 def _ensure_list(x):
     if isinstance(x, Species):
         return [x]
     else:
         return x
 
+def _species_key(spc):
+    """
+    Hashable description of a species query; two species with the
+    same key select the same reactions
+    """
+    return (spc.exclude, tuple(sorted((name, props['_role_str']) for name, props in spc.spc_dict.items())))
+
 def _rxn_ordinal(rxnlabel):
     result = _numre.search(rxnlabel)
     if result is None:
         return None
     else:
-        val = result.groups()[0]
-        try:
-            return eval(val)
-        except:
-            return int(val)
+        return int(result.groups()[0])
         
+
+import unittest
+
+class MechanismTestCase(unittest.TestCase):
+    def setUp(self):
+        self.mech = Mechanism(dict(species_list = dict(O = 'O', O3 = '3*O', NO2 = 'N + 2*O', O2 = '2*O'),
+                                   reaction_list = dict(IRR_1 = 'O2 ->[j] 2*O',
+                                                        IRR_2 = 'O + O2 ->[k] O3',
+                                                        IRR_3 = 'O3 ->[k] O + O2',
+                                                        IRR_4 = 'O + O3 ->[k] 2*O2',
+                                                        IRR_5 = 'NO2 + O ->[k] NO + O2',
+                                                        IRR_6 = 'NO2 ->[j] NO + O'),
+                                   species_group_list = ['Ox = O + O3']))
+
+    def scan_rxns(self, reactants = [], products = [], logical_and = True):
+        mech = self.mech
+        reactants = [mech.species_dict[spc] for spc in reactants]
+        products = [mech.species_dict[spc] for spc in products]
+        rct = set([rn for rn, rx in mech.reaction_dict.items() if all([rx.has_rct(spc) for spc in reactants])])
+        prd = set([rn for rn, rx in mech.reaction_dict.items() if all([rx.has_prd(spc) for spc in products])])
+        return sorted(rct.intersection(prd) if logical_and else rct.union(prd))
+
+    def testFindRxns(self):
+        mech = self.mech
+        for reactants, products in [([], []), (['O'], []), ([], ['O2']), (['O'], ['O2']),
+                                    (['O', 'O3'], []), (['Ox'], ['NO']), (['NO2'], ['O', 'NO'])]:
+            for logical_and in (True, False):
+                self.assertEqual(mech.find_rxns(reactants, products, logical_and), self.scan_rxns(reactants, products, logical_and))
+
+    def testFindRxnsExclude(self):
+        mech = self.mech
+        O = mech.species_dict['O']
+        self.assertEqual(mech.find_rxns(reactants = -O), ['IRR_1', 'IRR_3', 'IRR_6'])
+        self.assertEqual(mech.find_rxns(reactants = -O, reaction_type = 'j'), ['IRR_1', 'IRR_6'])
+        self.assertEqual(mech.find_rxns(reactants = -O, reaction_type = ['k', 'j']), ['IRR_1', 'IRR_3', 'IRR_6'])
+
+    def testAddRxn(self):
+        mech = self.mech
+        self.assertEqual(mech.find_rxns(reactants = 'NO'), [])
+        mech.add_rxn('IRR_7', 'NO + O3 ->[k] NO2 + O2')
+        self.assertEqual(mech.find_rxns(reactants = 'NO'), ['IRR_7'])
+        self.assertEqual(mech.find_rxns(products = 'NO2'), ['IRR_7'])
+
+    def testYamlNetRxn(self):
+        self.assertRaises(NotImplementedError, self.mech.yaml_net_rxn, ['IRR_1', 'IRR_2'])
+
+    def testVariables(self):
+        self.assertEqual([k for k in self.mech.variables if k.startswith('_')], [])
+
+    def testRxnThroughput(self):
+        mech = self.mech
+        mech.add_rxn('IRR_7', 'O3 ->[k] 0.7*O + 0.3*O3')
+        irr = (numpy.linspace(0.1, 3.7, 28, dtype = 'f').reshape(4, 7) / 7).view(PseudoNetCDFVariable)
+        irr.units = 'ppb'
+        mech.set_irr(irr, ['IRR_%d' % i for i in range(1, 8)])
+        Ox = mech.species_dict['Ox']
+        reactions = mech.find_rxns(reactants = Ox, products = Ox, logical_and = False)
+        terms = dict([(rxn, mech.reaction_dict[rxn].spc_term(Ox)) for rxn in reactions])
+        self.assertEqual(sorted([rxn for rxn, term in terms.items() if term is not None]), ['IRR_1', 'IRR_5', 'IRR_6'])
+        for rxn, term in terms.items():
+            if term is None:
+                continue
+            coef, weight = term
+            for aslice in (slice(None), slice(1, 3)):
+                irr_row = mech.irr[rxn][aslice]
+                self.assertEqual(float(abs(irr_row * numpy.float32(coef) * numpy.float32(weight)).sum()),
+                                 float(abs(mech(rxn)[aslice].get_spc(Ox)).sum()))
+        self.assertEqual(mech.reaction_dict['IRR_7'].spc_term(mech.species_dict['O']), (0.7, 1))
+
+    def testSetIrrSingleTime(self):
+        mech = self.mech
+        irr = numpy.linspace(0.1, 0.6, 6, dtype = 'f').reshape(1, 6).view(PseudoNetCDFVariable)
+        irr.units = 'ppb'
+        mech.set_irr(irr, ['IRR_%d' % i for i in range(1, 6)] + ['OTHER'])
+        self.assertEqual(mech.irr.shape, ())
+        for rxn in ['IRR_2', 'IRR_6']:
+            for key, value in mech.irr_dict[rxn]._stoic.items():
+                self.assertEqual(value.dtype, numpy.dtype('d'))
+        self.assertEqual(float(mech.irr_dict['IRR_2']['O3']), float(numpy.float32(0.2)))
+        self.assertEqual(float(mech.irr_dict['IRR_6']['O']), 0.)
+
+    def testAddSpcToReactions(self):
+        mech = self.mech
+        self.assertEqual(mech.add_spc_to_reactions('Ox'), 8)
+        self.assertEqual([rn for rn, rx in sorted(mech.reaction_dict.items()) if 'Ox' in rx.species()], ['IRR_1', 'IRR_2', 'IRR_3', 'IRR_4', 'IRR_5', 'IRR_6'])
+        self.assertEqual(float(mech.reaction_dict['IRR_4']['Ox']), -2.)
+
+if __name__ == '__main__':
+    unittest.main()
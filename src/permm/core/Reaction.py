@@ -20,7 +20,7 @@ from functools import reduce
 
 ReactionGroup = str
 
-__all__ = ['Stoic', 'Reaction']
+__all__ = ['Stoic', 'Reaction', 'reaction_sum']
 
 
 class Stoic(ndarray):
@@ -214,11 +214,16 @@ class Reaction(object):
             
     
     def _update_roles(self):
-        keys = list(self._stoic.keys())
-        self._species = tuple(set([spcn for spcn, role in keys]))
-        self._reactants = tuple(set([spcn for spcn, role in keys if role == 'r']))
-        self._products = tuple(set([spcn for spcn, role in keys if role == 'p']))
-        self._unspecified = tuple(set([spcn for spcn, role in keys if role == 'u']))
+        species = set()
+        by_role = dict(r = set(), p = set(), u = set())
+        for spcn, role in self._stoic:
+            species.add(spcn)
+            if role in by_role:
+                by_role[role].add(spcn)
+        self._species = tuple(species)
+        self._reactants = tuple(by_role['r'])
+        self._products = tuple(by_role['p'])
+        self._unspecified = tuple(by_role['u'])
         
     def roles(self, spc):
         """
@@ -393,9 +398,7 @@ class Reaction(object):
         result = self.copy()
         new_stoic = result[rhs]
         
-        result._roles[rhs.name] = new_stoic.role
-        result._species += (rhs.name,)
-        result._stoic[rhs.name] = new_stoic.view(ndarray)
+        result._stoic[rhs.name, new_stoic.role] = new_stoic.view(ndarray)
         result._update_roles()
 
         return result
@@ -458,9 +461,46 @@ class Reaction(object):
     def get(self, item, default = None):
         try:
             return self.__getitem__(item)
-        except:
+        except Exception:
             return default
 
+    def __spc_terms(self, item):
+        """
+        Return (spc, role, weight, mask) for each stoichiometry that
+        get_spc sums for a non-exclude item; mask is 'p' or 'r' when
+        an unspecified stoichiometry is limited to that role
+        """
+        terms = []
+        for spc, props in item.spc_dict.items():
+            spc_roles = props['role']
+            for role in spc_roles:
+                if (spc, role) in self._stoic:
+                    terms.append((spc, role, props['stoic'], None))
+            
+            if 'u' not in spc_roles and (spc, 'u') in self._stoic:
+                if role in ('p', 'r'):
+                    terms.append((spc, role, props['stoic'], role))
+        
+        return terms
+    
+    def spc_term(self, item):
+        """
+        Return (coefficient, weight) when get_spc(item) is the single
+        stoichiometry coefficient times the item weight; otherwise None
+        """
+        if item.exclude:
+            return None
+        
+        terms = self.__spc_terms(item)
+        if len(terms) != 1:
+            return None
+        
+        (spc, role, weight, mask), = terms
+        if mask is not None:
+            return None
+        
+        return self._stoic[spc, role], weight
+    
     def get_spc(self, *args):
         nargs = len(args)
         if nargs > 2:
@@ -487,23 +527,14 @@ class Reaction(object):
                     
                 
         else:
-            for spc, props in item.spc_dict.items():
-                spc_roles = props['role']
-                for role in spc_roles:
-                    if (spc, role) in self._stoic:
-                        values.append(item.spc_dict[spc]['stoic'] * self._stoic[spc, role])
-                        roles.append(role)
-                
-                if 'u' not in spc_roles and (spc, 'u') in self._stoic:
-                    val = self._stoic[spc, 'u']
-                    if role == 'p':
-                        values.append(item.spc_dict[spc]['stoic'] * masked_less(val, 0).filled(0))
-                        roles.append(role)
-                    elif role == 'r':
-                        values.append(item.spc_dict[spc]['stoic'] * masked_greater(val, 0).filled(0))
-                        roles.append(role)
-                    
-                
+            for spc, role, weight, mask in self.__spc_terms(item):
+                val = self._stoic[spc, 'u' if mask else role]
+                if mask == 'p':
+                    val = masked_less(val, 0).filled(0)
+                elif mask == 'r':
+                    val = masked_greater(val, 0).filled(0)
+                values.append(weight * val)
+                roles.append(role)
                 
         if len(values) == 0:
             if self._safe:
@@ -639,6 +670,33 @@ class Reaction(object):
         else:
             return self.copy()
         
+def reaction_sum(reaction_list):
+    """
+    Sum reactions into a net reaction; equivalent to adding them in
+    order, but stoichiometries are accumulated in place rather than
+    copied into a new reaction for each addition
+    """
+    if not all([isinstance(rxn, Reaction) for rxn in reaction_list]):
+        raise TypeError("Currently, only reactions can be added together")
+    if len(reaction_list) == 0:
+        raise ValueError("Sum of reactions requires at least one reaction")
+
+    kwds = {}
+    for rxn in reaction_list:
+        for key, v in rxn._stoic.items():
+            if key in kwds:
+                kwds[key] += v
+            else:
+                kwds[key] = v.copy()
+
+    reaction_types = set([rxn.reaction_type for rxn in reaction_list])
+    if len(reaction_types) == 1:
+        reaction_type, = reaction_types
+    else:
+        reaction_type = 'n'
+
+    return Reaction(kwds, reaction_type = reaction_type)
+
 import unittest
 
 class ReactionTestCase(unittest.TestCase):
@@ -681,6 +739,12 @@ class ReactionTestCase(unittest.TestCase):
         self.assertFalse(r1.has_prd(rs))
         self.assertTrue(r1.has_prd(ps))
         
+    def testSpcTerm(self):
+        r1 = self.rxns['NO2hv']
+        self.assertEqual(r1.spc_term(self.spcs['NO2']), (-1., 1))
+        self.assertEqual(r1.spc_term(self.spcs['NOx']), None)
+        self.assertEqual(r1.spc_term(Species('NO2', exclude = True)), None)
+        
     def testConsumes(self):
         r1 = self.rxns['NO2hv']
         rs = self.spcs['NO2']
@@ -738,6 +802,18 @@ class ReactionTestCase(unittest.TestCase):
             spc = self.spcs[spcn]
             self.assertAlmostEqual(r2[spc], -a * .66)
         
+    def testSum(self):
+        from numpy import arange
+        a = arange(5, dtype = 'd')
+        rxns = [self.rxns[k] * (a + i) for i, k in enumerate(['NO2hv', 'OplO3', 'NTRplOH'])]
+        r1 = reaction_sum(rxns)
+        r2 = rxns[0] + rxns[1] + rxns[2]
+        self.assertEqual(r1.reaction_type, r2.reaction_type)
+        self.assertEqual(set(r1._stoic), set(r2._stoic))
+        for key in r2._stoic:
+            self.assertTrue((r1._stoic[key] == r2._stoic[key]).all())
+        self.assertEqual(reaction_sum(rxns[1:2]).reaction_type, 'k')
+
     def testMulArray(self):
         from numpy import arange, round
         a = arange(0, 60, dtype = 'd').reshape(3,4,5) + .3
@@ -784,7 +860,7 @@ if __name__ == '__main__':
     print(nr[O])
     try:
         print(nr[O.reactant()])
-    except:
+    except Exception:
         pass
     print(nr.net())
     print(nr.net().condense(Ox))
@@ -1,38 +1,111 @@
-from copy import deepcopy
+from functools import lru_cache
+from sys import intern
 import re
 import yaml
 from numpy import float32, float64, int8, int16, int32, int64
 
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 _spc_def_re = re.compile(r'(?P<stoic>[-+]?[0-9]*\.?[0-9]+)?(?P<atom>\S+)\b(?=\s*\+\s*)?')
 
+# shared role frozensets and their sorted strings, keyed by role
+_ROLE_CACHE = {}
+
+def _intern_role(role):
+    """
+    Return the shared frozenset for role (an iterable of r, p and u)
+    and its sorted string (e.g., 'pr')
+    """
+    role = frozenset(role)
+    entry = _ROLE_CACHE.get(role)
+    if entry is None:
+        entry = _ROLE_CACHE[role] = (role, ''.join(sorted(role)))
+    return entry
+
+_ALL_ROLES = _intern_role('rpu')[0]
+
+_NUMERIC_CLASSES = (int, float, float32, float64, int8, int16, int32, int64)
+_NUMERIC_TYPES = frozenset(_NUMERIC_CLASSES)
+
+# compiled atom_guess patterns keyed by id of the atoms table
+_ATRE_CACHE = {}
+
+# atomic masses from openbabel keyed by atom symbol
+_ATOMIC_MASS_CACHE = {}
+
+def _mass_of(atom):
+    """
+    Return the atomic mass of atom (a symbol in the atoms table)
+    """
+    mass = _ATOMIC_MASS_CACHE.get(atom)
+    if mass is None:
+        from openbabel import OBAtom
+        from ..mechanisms import atoms as ALL_ATOMS
+        obatom = OBAtom()
+        obatom.SetAtomicNum(ALL_ATOMS[atom])
+        mass = _ATOMIC_MASS_CACHE[atom] = obatom.GetAtomicMass()
+    return mass
+
+def _default_name(spc_dict, exclude):
+    """
+    Name a species after its subspecies (e.g., NO+NO2 or -NO-NO2)
+    """
+    sep = {False: '+', True: '-'}[exclude]
+    prefix = {False: '', True: '-'}[exclude]
+    return prefix + sep.join(spc_dict)
+
+def _clone_spc_dict(spc_dict):
+    """
+    Copy a spc_dict ({name: {'stoic': ..., 'role': frozenset, 'atoms': dict}});
+    only atoms is mutable, so deepcopy is unnecessary
+    """
+    out = {}
+    for spc, props in spc_dict.items():
+        props = out[spc] = dict(props)
+        if 'atoms' in props:
+            props['atoms'] = dict(props['atoms'])
+    return out
+
+def _parse_stoic(stoic):
+    """
+    Convert a stoichiometry matched by _spc_def_re to an int or float
+    """
+    if '.' in stoic:
+        return float(stoic)
+    return int(stoic)
+
+# atom_parse and atom_guess results are cached and shared between callers;
+# copy before mutating (Species.__init__ does so via _clone_spc_dict)
+@lru_cache(maxsize = 4096)
 def atom_parse(spc_def):
-    global _spc_def_re
-    from ..mechanisms import atoms as ALL_ATOMS
     atomdict = {}
     for stoic, atom in _spc_def_re.findall(spc_def):
         if stoic == '':
             stoic = '1'
         if atom not in atomdict:
-            atomdict[atom] = eval(stoic)
+            atomdict[atom] = _parse_stoic(stoic)
         else:
-            atomdict[atom] += eval(stoic)
+            atomdict[atom] += _parse_stoic(stoic)
     
     return atomdict
 
+@lru_cache(maxsize = 4096)
 def atom_guess(spc_name):
     from ..mechanisms import atoms as ALL_ATOMS
     if '+' in spc_name or spc_name[:1].isdigit():
         return atom_parse(spc_name)
     lastl = ''
     atom_dict = {}
-    atre = re.compile(
-        '(' + '|'.join(sorted(ALL_ATOMS, key=lambda x: -len(x))) + ')\s*(\d{1,10})'
-    )
+    atre = _ATRE_CACHE.get(id(ALL_ATOMS))
+    if atre is None:
+        atre = _ATRE_CACHE[id(ALL_ATOMS)] = re.compile(
+            '(' + '|'.join([re.escape(at) for at in sorted(ALL_ATOMS, key=lambda x: -len(x))]) + r')\s*(\d{1,10})'
+        )
     for at, mul in atre.findall(spc_name):
-        if mul == '':
-            mul = '1'
-        atom_dict.setdefault(at, 0)
-        atom_dict[at] += int(mul)
+        atom_dict[at] = atom_dict.get(at, 0) + int(mul)
         # if l.isdigit():
         #     atom_dict[lastl] += int(l) - 1
         # elif l in ALL_ATOMS:
@@ -47,16 +120,18 @@ class Species(object):
     Species object has subspecies (e.g., NOx = NO + NO2) with
     stoichiometries and specified roles
     """
+    __slots__ = ('spc_dict', 'name', 'exclude', '_names')
+
     def __init__(self, spc_dict, name = None, exclude = False):
         if isinstance(spc_dict, str):
             if not ':' in spc_dict:
                 spc_dict = spc_dict.strip() + ':'
-            defs = yaml.safe_load(spc_dict)
+            defs = yaml.load(spc_dict, Loader = _SafeLoader)
             
             if len(defs) > 1:
                 raise ValueError('Species class can only initialize one object at a time')
             else:
-                (k, v), = list(defs.items())
+                (k, v), = defs.items()
                 if k is False: k = 'NO'
                 name = k
                 if v in (None, '', 'GUESS'):
@@ -67,25 +142,40 @@ class Species(object):
                     atom_dict = {}
                 spc_dict = {k: dict(stoic = 1, atoms = atom_dict)}
         
-        self.spc_dict = deepcopy(spc_dict)
-        if name:
-            self.name = name
-        else:
-            sep = {False: '+', True: '-'}[exclude]
-            prefix = {False: '', True: '-'}[exclude]
-            self.name = prefix + sep.join(list(spc_dict.keys()))
+        self.spc_dict = {}
+        self._names = None
+        self.name = name or _default_name(spc_dict, exclude)
             
-        for spc, props in self.spc_dict.items():
+        for spc, props in _clone_spc_dict(spc_dict).items():
             props.setdefault('stoic', 1)
-            props['role'] = set(props.get('role', 'rup'))
+            props['role'], props['_role_str'] = _intern_role(props.get('role', 'rup'))
             props.setdefault('atoms', {})
+            self.spc_dict[intern(spc) if isinstance(spc, str) else spc] = props
 
         self.exclude = exclude
     
+    @classmethod
+    def _from_normalized(cls, spc_dict, name = None, exclude = False):
+        """
+        Create a species that takes ownership of spc_dict, which must
+        be a fresh dictionary whose props all have stoic, role (interned
+        frozenset), _role_str and atoms (dict); skips the copy and
+        normalization in __init__
+        """
+        self = cls.__new__(cls)
+        self.spc_dict = spc_dict
+        self._names = None
+        self.name = name or _default_name(spc_dict, exclude)
+        self.exclude = exclude
+        return self
+    
     def __getitem__(self, spc_key):
         if isinstance(spc_key, str):
-            test_spc = Species({spc_key: dict(stoic = 1, role = set(['r', 'p', 'u']), atoms = {})}, name = spc_key)
-            return self[test_spc]
+            # a name selects the subspecies in all roles
+            check_props = self.spc_dict.get(spc_key)
+            if check_props is None or not _ALL_ROLES.issubset(check_props['role']):
+                raise KeyError('%s is not in %s' % (spc_key, self))
+            return Species._from_normalized({spc_key: dict(stoic = check_props['stoic'], role = _ALL_ROLES, _role_str = check_props['_role_str'], atoms = dict(check_props['atoms']))})
         out_spc = {}
         for this_spc, this_props in spc_key.spc_dict.items():
             if this_spc in self.spc_dict:
@@ -93,24 +183,43 @@ class Species(object):
                 if this_props['role'].issubset(check_props['role']):
                     out_spc[this_spc] = new_props = {}
                     new_props['stoic'] = this_props['stoic'] * check_props['stoic']
-                    new_props['atoms'] = deepcopy(this_props['atoms'])
+                    new_props['atoms'] = dict(this_props['atoms'])
                     new_props['atoms'].update(check_props['atoms'])
                     new_props['role'] = this_props['role']
+                    new_props['_role_str'] = this_props['_role_str']
         if len(out_spc) == 0:
             raise KeyError('%s is not in %s' % (spc_key, self))
 
-        return Species(out_spc, exclude = spc_key.exclude)
+        return Species._from_normalized(out_spc, exclude = spc_key.exclude)
     
+    def _select(self, spc_key):
+        """
+        Return {subspecies: (stoic, role)} for the subspecies that
+        self[spc_key] would select, without building a Species
+        """
+        if isinstance(spc_key, str):
+            key_dict = {spc_key: dict(stoic = 1, role = _ALL_ROLES)}
+        else:
+            key_dict = spc_key.spc_dict
+        out = {}
+        for this_spc, this_props in key_dict.items():
+            check_props = self.spc_dict.get(this_spc)
+            if check_props is not None and this_props['role'].issubset(check_props['role']):
+                out[this_spc] = (this_props['stoic'] * check_props['stoic'], this_props['role'])
+        if len(out) == 0:
+            raise KeyError('%s is not in %s' % (spc_key, self))
+        return out
+
     def __neg__(self):
-        return Species(deepcopy(self.spc_dict), name = '-(%s)' % self.name, exclude = True)
+        return Species._from_normalized(_clone_spc_dict(self.spc_dict), name = '-(%s)' % self.name, exclude = True)
     
     def __str__(self):
         if len(self.spc_dict) == 1:
-            (k, v), = list(self.spc_dict.items())
+            (k, v), = self.spc_dict.items()
             if k == self.name and v['stoic'] == 1.:
-                return ('%s(%s)' % (self.name, ''.join(sorted(self.spc_dict[self.name]['role'])))).replace('(pru)', '')
+                return ('%s(%s)' % (self.name, self.spc_dict[self.name]['_role_str'])).replace('(pru)', '')
         bool_op = (' = ', ' != ')[self.exclude]
-        result = self.name + bool_op + ' + '.join([('%.3f*%s(%s)' % (props['stoic'],spc, ''.join(sorted(props['role'])))).replace('(pru)', '') for spc, props in self.spc_dict.items()])
+        result = self.name + bool_op + ' + '.join([('%.3f*%s(%s)' % (props['stoic'],spc, props['_role_str'])).replace('(pru)', '') for spc, props in self.spc_dict.items()])
         return result
         
     def __repr__(self):
@@ -123,29 +232,32 @@ class Species(object):
         
     def names(self):
         """
-        Return list of subspecies names
+        Return list of subspecies names (cached; do not modify)
         """
-        return [n for n in list(self.spc_dict.keys())]
+        names = self._names
+        if names is None:
+            names = self._names = list(self.spc_dict)
+        return names
     
     def __contains__(self, lhs):
         if isinstance(lhs, Species):
-            return len(set(lhs.names()).intersection(self.names())) > 0
+            return any(k in self.spc_dict for k in lhs.spc_dict)
         elif isinstance(lhs, str):
-            return lhs in list(self.keys())
+            return lhs in self.spc_dict
             
     def __rmul__(self, y):
         return self.__mul__(y)
 
     def __mul__(self, y):
-        is_number = isinstance(y,(int,float, float32, float64, int8, int16, int32, int64))
+        is_number = type(y) in _NUMERIC_TYPES or isinstance(y, _NUMERIC_CLASSES)
         
         if is_number:
-            new_props = deepcopy(self.spc_dict)
+            new_props = _clone_spc_dict(self.spc_dict)
             for k, props in new_props.items():
                 props['stoic'] *= y
             new_name = "%s * %f" % (self.name,float(y))
             new_exclude = y <= 0
-            return Species(new_props, name = new_name, exclude = new_exclude)
+            return Species._from_normalized(new_props, name = new_name, exclude = new_exclude)
         else:
             raise TypeError("Can only multiply species by reactions")
 
@@ -159,14 +271,10 @@ class Species(object):
         """
         Return mass from atomic mass additions
         """
-        from openbabel import OBAtom
-        from ..mechanisms import atoms as ALL_ATOMS
-        obatom = OBAtom()
         mass = 0.
-        for spc, props in list(self.spc_dict.items()):
-            for atom, count in list(props['atoms'].items()):
-                obatom.SetAtomicNum(ALL_ATOMS[atom])
-                mass += obatom.GetAtomicMass() * count
+        for spc, props in self.spc_dict.items():
+            for atom, count in props['atoms'].items():
+                mass += _mass_of(atom) * count
         return mass*self
         
     def has_atom(self, atom):
@@ -188,12 +296,11 @@ class Species(object):
             for spc, props in self.spc_dict.items():
                 mul = props['atoms'].get(atom, 0)
                 if mul > 0:
-                    out_props[spc] = deepcopy(props)
-                    out_props[spc]['stoic'] *= mul
+                    out_props[spc] = dict(stoic = props['stoic'] * mul, role = props['role'], _role_str = props['_role_str'], atoms = dict(props['atoms']))
             if out_props == {}:
                 raise KeyError("Atom provided (%s) is not in %s" % (atom, self.name))
             else:
-                return Species(out_props, name = self.name + ':' + atom, exclude = self.exclude)
+                return Species._from_normalized(out_props, name = self.name + ':' + atom, exclude = self.exclude)
         else:
             raise KeyError("Atom provided (%s) is not an atom" % atom)
     
@@ -206,10 +313,8 @@ class Species(object):
         Return stoichiometry for species or subspecies
         """
         if spc is None:
-            spco = self
-        else:
-            spco = self[spc]
-        return sum(v['stoic'] for v in spco.spc_dict.values())
+            return sum(v['stoic'] for v in self.spc_dict.values())
+        return sum(stoic for stoic, role in self._select(spc).values())
 
     def iter_species_roles(self):
         """
@@ -224,10 +329,9 @@ class Species(object):
         Return the roles of this species or one of its subspecies (spc)
         """
         if spc is None:
-            spco = self
+            roles = [v['role'] for v in self.spc_dict.values()]
         else:
-            spco = self[spc]
-        roles = [v['role'] for v in spco.spc_dict.values()]
+            roles = [role for stoic, role in self._select(spc).values()]
 
         first_role = roles[0]
 
@@ -246,28 +350,28 @@ class Species(object):
         """
         Return a copy of species as a reactant only
         """
-        new_props = deepcopy(self.spc_dict)
+        new_props = _clone_spc_dict(self.spc_dict)
         for v in new_props.values():
-            v['role'] = set('r')
-        return Species(new_props, name = self.name, exclude = self.exclude)
+            v['role'], v['_role_str'] = _intern_role('r')
+        return Species._from_normalized(new_props, name = self.name, exclude = self.exclude)
 
     def unspecified(self):
         """
         Return a copy of species as an unspecified role
         """
-        new_props = deepcopy(self.spc_dict)
+        new_props = _clone_spc_dict(self.spc_dict)
         for v in new_props.values():
-            v['role'] = set('u')
-        return Species(new_props, name = self.name, exclude = self.exclude)
+            v['role'], v['_role_str'] = _intern_role('u')
+        return Species._from_normalized(new_props, name = self.name, exclude = self.exclude)
 
     def product(self):
         """
         Return a copy of species as a product
         """
-        new_props = deepcopy(self.spc_dict)
+        new_props = _clone_spc_dict(self.spc_dict)
         for v in new_props.values():
-            v['role'] = set('p')
-        return Species(new_props, name = self.name, exclude = self.exclude)
+            v['role'], v['_role_str'] = _intern_role('p')
+        return Species._from_normalized(new_props, name = self.name, exclude = self.exclude)
 
 def species_sum(species_list):
     if not all([isinstance(spc,Species) for spc in species_list]):
@@ -277,9 +381,9 @@ def species_sum(species_list):
     exclude_names = set()
     for next_species in species_list:
         if next_species.exclude:
-            exclude_names.update(list(next_species.spc_dict.keys()))
+            exclude_names.update(next_species.spc_dict)
         else:
-            include_names.update(list(next_species.spc_dict.keys()))
+            include_names.update(next_species.spc_dict)
     
     out_include_names = include_names.difference(exclude_names)
     out_exclude_names = exclude_names.difference(include_names)
@@ -303,12 +407,12 @@ def species_sum(species_list):
             outatoms = outprops['atoms']
             inatoms = inprops['atoms']
             for atom, value in inatoms.items():
-                try:
-                    outatoms[atom] += value
-                except:
-                    outatoms[atom] = value
+                outatoms[atom] = outatoms.get(atom, 0) + value
 
-    return Species(out_props, exclude = exclude)
+    for outprops in out_props.values():
+        outprops['role'], outprops['_role_str'] = _intern_role(outprops['role'])
+
+    return Species._from_normalized(out_props, exclude = exclude)
 
 
 import unittest
@@ -365,6 +469,12 @@ class SpeciesTestCase(unittest.TestCase):
         self.assertEqual(s3.atoms('O').stoic(s2), 2)
         self.assertEqual(s3.atoms('O').stoic(s3), 3)
 
+    def testAtomGuess(self):
+        self.assertEqual(Species('ISOP: C5H8').spc_dict['ISOP']['atoms'], dict(C = 5, H = 8))
+        # lumped names are not formulas and must not be read as atoms
+        self.assertEqual(Species('ISOP').spc_dict['ISOP']['atoms'], {})
+        self.assertEqual(Species('PAR').spc_dict['PAR']['atoms'], {})
+
     def testMul(self):
         s1 = self.species['OH']
         s3 = 2 * s1
@@ -378,6 +488,8 @@ class SpeciesTestCase(unittest.TestCase):
         s3 = self.species['HOx']
         self.assertTrue(s1 in s3)
         self.assertFalse(s2 in s3)
+        self.assertTrue('OH' in s3)
+        self.assertFalse('O3' in s3)
 
     def testCopy(self):
         s1 = self.species['OH']
@@ -1,13 +1,20 @@
 def parse_and_run():
     import os
-    from argparse import ArgumentParser
+    from argparse import ArgumentParser, RawDescriptionHelpFormatter
     from warnings import warn
     from permm import mechanism_dict, Mechanism
     from permm.analyses import __all__ as all_analyses
     all_mechs = '|'.join(list(mechanism_dict.keys()))
+    mech_comments = []
+    for mech_name in sorted(mechanism_dict.keys()):
+        comment = str(mechanism_dict.header(mech_name).get('comment', '')).strip()
+        if comment != '':
+            mech_comments.append('  %s: %s' % (mech_name, comment.splitlines()[0]))
     all_analyses = '|'.join(all_analyses)
     from PseudoNetCDF.pncparse import getparser, pncparse
-    parser = ArgumentParser(description = "permm (Python Environment for Reaction Mechanism Mathematics)")
+    parser = ArgumentParser(description = "permm (Python Environment for Reaction Mechanism Mathematics)", \
+                            epilog = "mechanisms:\n" + "\n".join(mech_comments), \
+                            formatter_class = RawDescriptionHelpFormatter)
     parser.add_argument("--gui", dest="graphical", \
                         action="store_true", default=False, \
                         help="open a graphical user interactive environment")
@@ -1,40 +1,81 @@
 
-from yaml import safe_load
+from yaml import load
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
 from glob import glob
 from os.path import basename, abspath, dirname, join
-from collections import defaultdict
 
 from permm.core.Mechanism import Mechanism
 _mechanisms_dir = abspath(dirname(__file__))
 
-atoms = safe_load(open(join(_mechanisms_dir, 'atoms.yaml')))
+with open(join(_mechanisms_dir, 'atoms.yaml'), 'rb') as _atoms_stream:
+    atoms = load(_atoms_stream, Loader = _SafeLoader)
 
-class _mech_fromkey(defaultdict):
+# top-level sections that hold the body of a mechanism file
+_body_sections = (b'species_list', b'reaction_list', b'net_reaction_list', b'species_group_list', b'process_group_list')
+
+def _read_header(path):
+    """
+    Parse the top-level entries (e.g., comment) that precede the first
+    body section of a mechanism file; files without a body section are
+    parsed whole
+    """
+    lines = []
+    with open(path, 'rb') as yaml_stream:
+        for line in yaml_stream:
+            if line.split(b':', 1)[0] in _body_sections:
+                break
+            lines.append(line)
+    return load(b''.join(lines), Loader = _SafeLoader) or {}
+
+class _mech_fromkey(dict):
     def __init__(self):
         self._paths = dict([(basename(path)[:-5], path) for path in glob(join(_mechanisms_dir, '*.yaml'))])
+        self._headers = {}
+
+    def header(self, key):
+        """
+        Return the header entries of mechanism key (see _read_header)
+        without building the mechanism
+        """
+        header = self._headers.get(key)
+        if header is None:
+            header = self._headers[key] = _read_header(self._paths[key])
+        return header
 
     def keys(self):
-        return [k for k in list(self._paths.keys())]
+        return self._paths.keys()
         
     def iterkeys(self):
-        for key in list(self._paths.keys()):
-            return key
+        return iter(self._paths)
         
     def iteritems(self):
-        for key in list(self._paths.keys()):
+        for key in self._paths:
             yield key, self[key]
 
     def __iter__(self):            
-        return iter(list(self.keys()))
-        
-    def keys(self):
-        return tuple(self._paths.keys())
+        return iter(self._paths)
         
     def __missing__(self, key):
-        if key not in list(self._paths.keys()):
-            raise KeyError("%s not in mechanisms")
+        if key not in self._paths:
+            raise KeyError("%s not in mechanisms" % key)
         
         mech = self[key] = Mechanism(self._paths[key])
         return mech
         
 mechanism_dict = _mech_fromkey()
+
+import unittest
+
+class MechFromKeyTestCase(unittest.TestCase):
+    def testHeader(self):
+        mechs = _mech_fromkey()
+        header = mechs.header('cb05_camx')
+        self.assertEqual(list(header), ['comment'])
+        self.assertTrue(header['comment'].startswith('Carbon Bond 05'))
+        self.assertFalse(dict.__contains__(mechs, 'cb05_camx'))
+
+if __name__ == '__main__':
+    unittest.main()